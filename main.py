@@ -5,24 +5,39 @@ Deploy to Render: https://render.com
 Environment Variables:
 - PORT: Port to run on (default: 10000 for Render)
 - API_KEY: Optional API key for authentication
+- ROSTER_WORKERS: Processes used for roster generation (default: 2, 1 on single-CPU hosts; 1 generates in-process)
+- WORKERS: Server processes when run via `python main.py` (default: 1)
 """
 
 import os
+import hmac
+import time
 import json
+import asyncio
+import heapq
 import io
 import base64
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
-from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from enum import Enum, IntEnum
 
 from fastapi import FastAPI, HTTPException, Header, Depends, BackgroundTasks
-from fastapi.responses import JSONResponse, StreamingResponse
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-import pandas as pd
+import numpy as np
+import orjson
+import xlsxwriter
 import uvicorn
 
+try:
+    from numba import njit
+except ImportError:  # Numba is pinned in requirements; the plain Python path is a slower fallback
+    njit = None
+
 # ============================================================================
 # DATA MODELS
 # ============================================================================
@@ -31,8 +46,12 @@ class RosterRequest(BaseModel):
     month: int = Field(..., ge=1, le=12, description="Month (1-12)")
     year: int = Field(..., ge=2024, le=2030, description="Year (2024-2030)")
     include_excel: bool = Field(default=True, description="Include Excel file in response")
+    excel_inline: bool = Field(default=True, description="Embed Excel as base64 in the JSON response; false streams the file instead")
     format: str = Field(default="json", description="Output format: json, excel, or both")
 
+class YearRosterRequest(BaseModel):
+    year: int = Field(..., ge=2024, le=2030, description="Year (2024-2030)")
+
 class ShiftValidateRequest(BaseModel):
     roster_data: Dict[str, Any]
     rules: List[str] = Field(default=["night_pattern", "leave_compliance", "sunday_rule"])
@@ -43,6 +62,21 @@ class MCPResponse(BaseModel):
     error: Optional[str] = None
     metadata: Dict[str, Any] = {}
 
+class Shift(IntEnum):
+    """Compact shift codes used by the engine's int8 schedule"""
+    NONE = 0
+    N = 1
+    SD = 2
+    DO = 3
+    OH = 4
+    PM = 5
+    A = 6
+    OH_EMD = 7
+    OH_BIMA = 8
+
+# Roster labels indexed by Shift value
+SHIFT_LABELS = np.array([None, "N", "SD", "DO", "OH", "PM", "A", "OH+EMD", "OH+BIMA"], dtype=object)
+
 # ============================================================================
 # STAFF DATABASE WITH REALISTIC SHIFT PREFERENCES
 # ============================================================================
@@ -217,10 +251,148 @@ LEAVE_2026 = [
     {"code": "PAUL", "start": "2026-06-29", "end": "2026-07-27"}
 ]
 
+# Leave schedule as (code, start_ordinal, end_ordinal), parsed once at import
+LEAVE_ORDS = [
+    (e["code"], date.fromisoformat(e["start"]).toordinal(), date.fromisoformat(e["end"]).toordinal())
+    for e in LEAVE_2026
+]
+
 # ============================================================================
 # ROSTER ENGINE WITH REALISTIC SHIFT PREFERENCES
 # ============================================================================
 
+# Months of generated rosters kept in memory by each engine
+ROSTER_CACHE_SIZE = 128
+
+# today_iso() state: [ISO date string, epoch seconds of the next local midnight]
+_TODAY_CACHE: List[Any] = ["", 0.0]
+
+def today_iso() -> str:
+    """date.today().isoformat(), recomputed only once the local day rolls over"""
+    if time.time() >= _TODAY_CACHE[1]:
+        today = date.today()
+        midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        _TODAY_CACHE[:] = [today.isoformat(), midnight.timestamp()]
+    return _TODAY_CACHE[0]
+
+@dataclass(slots=True, frozen=True)
+class StaffRec:
+    """Staff record normalized from STAFF_DB for fast attribute access"""
+    code: str
+    pref_type: str
+    night_eligible: bool
+    weekend_day: Optional[str]
+    no_pm: bool
+    night_emd: bool
+    shuffle: bool
+    oh_few: bool
+    
+    @classmethod
+    def from_staff(cls, staff: Dict[str, Any]) -> "StaffRec":
+        pref = staff.get("shift_preference", {"type": "default"})
+        return cls(
+            code=staff["code"],
+            pref_type=pref.get("type", "default"),
+            night_eligible=bool(staff.get("night_eligible")),
+            weekend_day=pref.get("weekend_day"),
+            no_pm=bool(pref.get("no_pm")),
+            night_emd=bool(pref.get("night_emd")),
+            shuffle=bool(pref.get("shuffle")),
+            oh_few=bool(pref.get("oh_few")),
+        )
+
+def _fill_night_from(heap: list, schedule: np.ndarray, leave_mask: np.ndarray,
+                     night_totals: np.ndarray, day: int, assigned_tonight: int) -> int:
+    """
+    Pop candidates off one tier's (nights so far, staff index) min-heap
+    until the night holds two staff, then push everyone tried back with
+    their updated count. Returns the number assigned tonight.
+    """
+    days = schedule.shape[1]
+    tried = np.empty(len(heap), dtype=np.intp)
+    n_tried = 0
+    while heap and assigned_tonight < 2:  # 2 staff per night
+        idx = heapq.heappop(heap)[1]
+        tried[n_tried] = idx
+        n_tried += 1
+        
+        if leave_mask[idx, day]:
+            continue
+        
+        if schedule[idx, day] != Shift.NONE:
+            continue
+        
+        # Check if can start new sequence
+        can_start = True
+        if day > 0:
+            prev = schedule[idx, day - 1]
+            if prev == Shift.N or prev == Shift.SD:
+                can_start = False
+            if prev == Shift.N:
+                if day > 1 and schedule[idx, day - 2] == Shift.N:
+                    can_start = False
+                else:
+                    # Continue sequence
+                    schedule[idx, day] = Shift.N
+                    if day + 1 < days:
+                        schedule[idx, day + 1] = Shift.SD
+                    if day + 2 < days:
+                        schedule[idx, day + 2] = Shift.DO
+                    night_totals[idx] += 1
+                    assigned_tonight += 1
+                    can_start = False
+                    continue
+        
+        if can_start and day + 3 < days:
+            # Shift.NONE is 0, so an all-zero window means four free days
+            if not schedule[idx, day:day + 4].any() and not leave_mask[idx, day:day + 4].any():
+                schedule[idx, day] = Shift.N
+                schedule[idx, day + 1] = Shift.N
+                schedule[idx, day + 2] = Shift.SD
+                schedule[idx, day + 3] = Shift.DO
+                night_totals[idx] += 2
+                assigned_tonight += 1
+    
+    for k in range(n_tried):
+        idx = tried[k]
+        heapq.heappush(heap, (night_totals[idx], idx))
+    return assigned_tonight
+
+def _phase1_nights(schedule: np.ndarray, leave_mask: np.ndarray, is_sunday: np.ndarray,
+                   primary_idx: np.ndarray, secondary_idx: np.ndarray, night_totals: np.ndarray) -> None:
+    """
+    Assign N→N→SD→DO night sequences in place, two staff per night.
+    Sequential by nature (each day depends on yesterday), so it is JIT
+    compiled with Numba when available.
+    """
+    # Min-heaps of (nights so far, staff index) per tier; the index keeps ties reproducible
+    primary_heap = [(night_totals[i], i) for i in primary_idx]
+    secondary_heap = [(night_totals[i], i) for i in secondary_idx]
+    heapq.heapify(primary_heap)
+    heapq.heapify(secondary_heap)
+    
+    for day in range(schedule.shape[1]):
+        # Skip Sundays for night shifts (most staff prefer)
+        if is_sunday[day]:
+            continue
+        
+        # Prioritize night-predominant staff, fewest nights first; the rest
+        # of the pool is only touched when the night is still short
+        assigned_tonight = _fill_night_from(primary_heap, schedule, leave_mask, night_totals, day, 0)
+        if assigned_tonight < 2:
+            _fill_night_from(secondary_heap, schedule, leave_mask, night_totals, day, assigned_tonight)
+
+if njit is not None:
+    _fill_night_from = njit(cache=True)(_fill_night_from)
+    _phase1_nights = njit(cache=True)(_phase1_nights)
+
+class RosterEngineError(Exception):
+    """Roster request the engine cannot serve; code is a short machine-readable reason"""
+    
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
 class RosterEngine:
     """
     Production Roster Engine implementing realistic lab shift preferences
@@ -228,21 +400,38 @@ class RosterEngine:
     
     def __init__(self):
         self.staff = {s["code"]: s for s in STAFF_DB}
-        self.leave_records = LEAVE_2026
         
-    def is_on_leave(self, staff_code: str, current_date: date) -> bool:
-        """Check if staff is on annual leave"""
-        for entry in self.leave_records:
-            if entry["code"] == staff_code:
-                start = date.fromisoformat(entry["start"])
-                end = date.fromisoformat(entry["end"])
-                if start <= current_date <= end:
-                    return True
-                if start.year > end.year:
-                    if current_date >= start or current_date <= end:
-                        return True
-        return False
-    
+        # Frozen staff views for index-based access in the generation loops
+        self.staff_codes: Tuple[str, ...] = tuple(self.staff)
+        self.staff_list: Tuple[Dict[str, Any], ...] = tuple(self.staff.values())
+        self.n_staff = len(self.staff_codes)
+        self.records: List[StaffRec] = [StaffRec.from_staff(s) for s in self.staff_list]
+        self.pref_types = np.array([rec.pref_type for rec in self.records], dtype=object)
+        # Night eligible staff (only those not restricted)
+        self.night_eligible_idx = np.array([
+            i for i, rec in enumerate(self.records)
+            if rec.night_eligible and rec.pref_type not in ("strict_oh", "pm_predominant")
+        ], dtype=np.intp)
+
+        # Leave intervals per staff as (start, end) ordinals. No current entry ends
+        # before it starts; splitting such wrapped entries is defensive, keeping the
+        # original year-wrap handling should one be added
+        self._leave_by_code: Dict[str, List[Tuple[int, int]]] = {}
+        for code, start, end in LEAVE_ORDS:
+            intervals = self._leave_by_code.setdefault(code, [])
+            if start > end:
+                intervals.append((start, date.max.toordinal()))
+                intervals.append((date.min.toordinal(), end))
+            else:
+                intervals.append((start, end))
+        for intervals in self._leave_by_code.values():
+            intervals.sort()
+        
+        # Rosters are deterministic per (year, month); each entry keeps the raw
+        # schedule and calendar next to the result so exports skip the dicts
+        self._roster_cache: Dict[Tuple[int, int], Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]] = {}
+        self._excel_cache: Dict[Tuple[int, int], bytes] = {}
+
     def get_days_in_month(self, year: int, month: int) -> int:
         """Calculate days in month"""
         if month == 12:
@@ -250,232 +439,291 @@ class RosterEngine:
         else:
             next_month = date(year, month + 1, 1)
         return (next_month - date(year, month, 1)).days
+
+    def build_leave_mask(self, year: int, month: int, days: int) -> np.ndarray:
+        """Boolean (staff, day) matrix marking annual leave for the month"""
+        first = date(year, month, 1).toordinal()
+        day_ords = np.arange(first, first + days)
+        leave_mask = np.zeros((self.n_staff, days), dtype=bool)
+        for i, code in enumerate(self.staff_codes):
+            for s, e in self._leave_by_code.get(code, ()):
+                leave_mask[i] |= (day_ords >= s) & (day_ords <= e)
+        return leave_mask
+
+    def _month_calendar(self, year: int, month: int, days: int) -> SimpleNamespace:
+        """
+        Per-day calendar arrays shared by every generation phase, starting
+        on the 1st of the month. Rotation masks count days from the 1st of
+        each month, so a range spanning several months matches
+        month-by-month generation.
+        """
+        first = date(year, month, 1)
+        dates = [first + timedelta(days=day) for day in range(days)]
+        weekday = np.array([d.weekday() for d in dates], dtype=np.int8)
+        day_index = np.array([d.day - 1 for d in dates])
+        return SimpleNamespace(
+            weekday=weekday,
+            is_sunday=weekday == 6,
+            is_saturday=weekday == 5,
+            is_weekend=weekday >= 5,
+            iso_date=np.array([d.isoformat() for d in dates], dtype=object),
+            day_name=np.array([d.strftime("%A") for d in dates], dtype=object),
+            mod2=day_index % 2 == 0,
+            mod3=day_index % 3 == 0,
+            mod4=day_index % 4 == 0,
+            even_week=(day_index // 7) % 2 == 0,
+        )
+    
+    def _slice_calendar(self, cal: SimpleNamespace, start: int, end: int) -> SimpleNamespace:
+        """Calendar view over days [start, end)"""
+        return SimpleNamespace(**{name: values[start:end] for name, values in vars(cal).items()})
+    
+    def _preference_pattern(self, pref_type: str, weekend_day: Optional[str], night_emd: bool,
+                            shuffle: bool, cal: SimpleNamespace) -> np.ndarray:
+        """Shift row for a preference group, before night shifts and leave are applied"""
+        if pref_type == "strict_oh":
+            # Strict OH only, specific weekend day or DO
+            pattern = np.full(len(cal.weekday), Shift.OH, dtype=np.int8)
+            if weekend_day != "Sunday":
+                pattern[cal.is_sunday] = Shift.DO
+            if weekend_day != "Saturday":
+                pattern[cal.is_saturday] = Shift.DO
+        elif pref_type == "oh_weekdays_pm_weekends":
+            # OH on weekdays, PM on weekends
+            pattern = np.full(len(cal.weekday), Shift.OH, dtype=np.int8)
+            if shuffle:
+                # Alternate PM between Sat and Sun week by week
+                pm_day = np.where(cal.even_week, cal.is_saturday, cal.is_sunday)
+                pattern[cal.is_weekend] = Shift.DO
+                pattern[pm_day] = Shift.PM
+            else:
+                pattern[cal.is_weekend] = Shift.PM
+        elif pref_type == "oh_weekdays_pm_sunday":
+            # OH on weekdays, PM only on Sunday
+            pattern = np.full(len(cal.weekday), Shift.OH, dtype=np.int8)
+            pattern[cal.is_saturday] = Shift.DO
+            pattern[cal.is_sunday] = Shift.PM
+        elif pref_type == "emd_predominant":
+            # Emergency lab predominant, rotating between OH+EMD and OH
+            # Night EMD staff get fewer day EMD shifts
+            rotation = cal.mod4 if night_emd else cal.mod2
+            pattern = np.where(rotation, Shift.OH_EMD, Shift.OH).astype(np.int8)
+            pattern[cal.is_saturday] = Shift.DO
+            if weekend_day == "Sunday":
+                pattern[cal.is_sunday] = Shift.OH
+        elif pref_type == "pm_predominant":
+            # PM predominant, few OH
+            pattern = np.where(cal.mod3, Shift.OH, Shift.PM).astype(np.int8)
+            pattern[cal.is_weekend] = Shift.DO
+        elif pref_type == "night_predominant":
+            # Night predominant - nights come from phase 1, otherwise DO or occasional OH
+            pattern = np.where(cal.mod3, Shift.OH, Shift.DO).astype(np.int8)
+            pattern[cal.is_weekend] = Shift.DO
+        elif pref_type == "bima_predominant":
+            # BIMA predominant, their Sunday working day is plain OH
+            pattern = np.full(len(cal.weekday), Shift.OH_BIMA, dtype=np.int8)
+            pattern[cal.is_saturday] = Shift.DO
+            if weekend_day == "Sunday":
+                pattern[cal.is_sunday] = Shift.OH
+        else:
+            # Default rules
+            pattern = np.full(len(cal.weekday), Shift.OH, dtype=np.int8)
+            pattern[cal.is_weekend] = Shift.DO
+        return pattern
     
-    def get_staff_preference(self, code: str) -> Dict[str, Any]:
-        """Get shift preference for staff member"""
-        staff = self.staff.get(code, {})
-        return staff.get("shift_preference", {"type": "default"})
+    def clear_cache(self) -> int:
+        """Drop memoized rosters and Excel exports, returning how many months were cached"""
+        cached_months = len(self._roster_cache)
+        self._roster_cache.clear()
+        self._excel_cache.clear()
+        return cached_months
+    
+    def _remember(self, key: Tuple[int, int],
+                  entry: Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]) -> None:
+        """Store a generated month, evicting the least recently used once the cache is full"""
+        if len(self._roster_cache) >= ROSTER_CACHE_SIZE:
+            oldest = next(iter(self._roster_cache))
+            del self._roster_cache[oldest]
+            self._excel_cache.pop(oldest, None)
+        self._roster_cache[key] = entry
+    
+    def _lookup(self, key: Tuple[int, int]) -> Optional[Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]]:
+        """Cached entry for a month, moved to the back of the eviction order on a hit"""
+        entry = self._roster_cache.pop(key, None)
+        if entry is not None:
+            self._roster_cache[key] = entry
+        return entry
+    
+    @staticmethod
+    def _check_period(year: int, month: int = 1) -> None:
+        """Reject periods the calendar cannot represent (the year after must exist too)"""
+        if not 1 <= month <= 12:
+            raise RosterEngineError("invalid_month")
+        if not date.min.year <= year < date.max.year:
+            raise RosterEngineError("invalid_year")
+    
+    def cached(self, month: int, year: int) -> Optional[Dict[str, Any]]:
+        """Return the memoized roster for a month, or None if it has not been generated"""
+        entry = self._lookup((year, month))
+        return entry[0] if entry is not None else None
+    
+    def adopt(self, month: int, year: int,
+              entry: Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]) -> Dict[str, Any]:
+        """Cache a month generated elsewhere (e.g. in a worker process) and return its roster"""
+        key = (year, month)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached[0]
+        self._remember(key, entry)
+        return entry[0]
     
     def generate(self, month: int, year: int) -> Dict[str, Any]:
         """
-        Generate complete roster with realistic shift preferences
+        Generate complete roster with realistic shift preferences, memoized per month
+        """
+        key = (year, month)
+        entry = self._lookup(key)
+        if entry is None:
+            entry = self._generate_impl(year, month)
+            self._remember(key, entry)
+        return entry[0]
+    
+    def generate_year(self, year: int) -> List[Dict[str, Any]]:
+        """
+        Generate all twelve monthly rosters of a year in one pass. Nights are
+        still assigned month by month; preference rules run once over the
+        whole year. Results are identical to calling generate() per month.
         """
+        self._check_period(year)
+        keys = [(year, month) for month in range(1, 13)]
+        if all(key in self._roster_cache for key in keys):
+            return [self._lookup(key)[0] for key in keys]
+        
+        results = []
+        for key, entry in zip(keys, self._generate_year_impl(year)):
+            cached = self._lookup(key)
+            if cached is None:
+                self._remember(key, entry)
+                cached = entry
+            results.append(cached[0])
+        return results
+    
+    def _generate_year_impl(self, year: int) -> List[Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]]:
+        """Run both roster phases over a whole year, returning each month's entry without caching it"""
+        self._check_period(year)
+        days_total = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+        leave_mask = self.build_leave_mask(year, 1, days_total)
+        cal = self._month_calendar(year, 1, days_total)
+        schedule = np.full((self.n_staff, days_total), Shift.NONE, dtype=np.int8)
+        
+        spans = []
+        start = 0
+        for month in range(1, 13):
+            end = start + self.get_days_in_month(year, month)
+            night_counts = self._assign_nights(
+                schedule[:, start:end], leave_mask[:, start:end], self._slice_calendar(cal, start, end)
+            )
+            spans.append((month, start, end, night_counts))
+            start = end
+        
+        self._apply_preferences(schedule, leave_mask, cal)
+        
+        entries = []
+        for month, start, end, night_counts in spans:
+            month_schedule = schedule[:, start:end]
+            month_cal = self._slice_calendar(cal, start, end)
+            result = self._build_result(year, month, month_schedule, month_cal, night_counts)
+            entries.append((result, month_schedule, month_cal))
+        return entries
+    
+    def _generate_impl(self, year: int, month: int) -> Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]:
+        """Run both roster phases for one month, returning the result with its schedule and calendar"""
+        self._check_period(year, month)
         days = self.get_days_in_month(year, month)
+        leave_mask = self.build_leave_mask(year, month, days)
+        cal = self._month_calendar(year, month, days)
         
-        # Get night eligible staff (only those not restricted)
-        night_eligible = [
-            code for code, s in self.staff.items() 
-            if s.get("night_eligible") and 
-            self.get_staff_preference(code).get("type") not in ["strict_oh", "pm_predominant"]
-        ]
+        # Initialize schedule (one int8 row per staff, Shift.NONE = unassigned)
+        schedule = np.full((self.n_staff, days), Shift.NONE, dtype=np.int8)
+        night_counts = self._assign_nights(schedule, leave_mask, cal)
+        self._apply_preferences(schedule, leave_mask, cal)
+        return self._build_result(year, month, schedule, cal, night_counts), schedule, cal
+    
+    def _assign_nights(self, schedule: np.ndarray, leave_mask: np.ndarray,
+                       cal: SimpleNamespace) -> Dict[str, int]:
+        """PHASE 1: Assign night shifts (N→N→SD→DO pattern) for one month"""
+        night_totals = np.zeros(self.n_staff, dtype=np.int64)
         
-        # Initialize schedule
-        schedule = {code: [None] * days for code in self.staff.keys()}
-        night_counts = {code: 0 for code in night_eligible}
+        # Night-predominant and EMD staff are tried before the rest of the night eligible pool
+        night_eligible = self.night_eligible_idx
+        predominant = np.isin(self.pref_types[night_eligible], ("night_predominant", "emd_predominant"))
+        primary_idx = night_eligible[predominant]
+        secondary_idx = night_eligible[~predominant]
         
-        # PHASE 1: Assign night shifts (N→N→SD→DO pattern)
-        # Only for night-predominant and night-eligible staff
-        night_predominant = [
-            code for code in self.staff.keys()
-            if self.get_staff_preference(code).get("type") in ["night_predominant", "emd_predominant"]
-            and code in night_eligible
-        ]
+        _phase1_nights(schedule, leave_mask, cal.is_sunday, primary_idx, secondary_idx, night_totals)
         
-        for day in range(days):
-            current_date = date(year, month, day + 1)
-            
-            # Skip Sundays for night shifts (most staff prefer)
-            if current_date.weekday() == 6:
-                continue
-            
-            assigned_tonight = 0
-            # Prioritize night-predominant staff
-            candidates = sorted(
-                [c for c in night_predominant if c in night_eligible], 
-                key=lambda x: night_counts[x]
-            ) + sorted(
-                [c for c in night_eligible if c not in night_predominant],
-                key=lambda x: night_counts[x]
-            )
-            
-            for candidate in candidates:
-                if assigned_tonight >= 2:  # 2 staff per night
-                    break
-                    
-                if self.is_on_leave(candidate, current_date):
-                    continue
-                
-                if schedule[candidate][day] is not None:
-                    continue
-                
-                # Check if can start new sequence
-                can_start = True
-                if day > 0:
-                    prev = schedule[candidate][day - 1]
-                    if prev in ["N", "SD"]:
-                        can_start = False
-                    if prev == "N":
-                        if day > 1 and schedule[candidate][day - 2] == "N":
-                            can_start = False
-                        else:
-                            # Continue sequence
-                            schedule[candidate][day] = "N"
-                            if day + 1 < days:
-                                schedule[candidate][day + 1] = "SD"
-                            if day + 2 < days:
-                                schedule[candidate][day + 2] = "DO"
-                            night_counts[candidate] += 1
-                            assigned_tonight += 1
-                            can_start = False
-                            continue
-                
-                if can_start and day + 3 < days:
-                    if all(schedule[candidate][day + i] is None for i in range(4)):
-                        leave_check = [self.is_on_leave(candidate, date(year, month, day + i + 1)) for i in range(4)]
-                        if not any(leave_check):
-                            schedule[candidate][day] = "N"
-                            schedule[candidate][day + 1] = "N"
-                            schedule[candidate][day + 2] = "SD"
-                            schedule[candidate][day + 3] = "DO"
-                            night_counts[candidate] += 2
-                            assigned_tonight += 1
+        return {self.staff_codes[i]: int(night_totals[i]) for i in night_eligible}
+    
+    def _apply_preferences(self, schedule: np.ndarray, leave_mask: np.ndarray, cal: SimpleNamespace) -> None:
+        """PHASE 2: Fill remaining shifts based on preferences"""
+        # Leave overrides everything, including SD/DO tails from phase 1
+        schedule[leave_mask] = Shift.A
         
-        # PHASE 2: Fill remaining shifts based on preferences
-        roster = []
+        # Staff sharing a preference variant get one row pattern, written a group at a time
+        night_pool = set(self.night_eligible_idx.tolist())
+        groups: Dict[Tuple[str, Optional[str], bool, bool], List[int]] = {}
+        for i, rec in enumerate(self.records):
+            night_emd = rec.night_emd and i in night_pool
+            key = (rec.pref_type, rec.weekend_day, night_emd, rec.shuffle)
+            groups.setdefault(key, []).append(i)
+        for (pref_type, weekend_day, night_emd, shuffle), members in groups.items():
+            pattern = self._preference_pattern(pref_type, weekend_day, night_emd, shuffle, cal)
+            rows = schedule[members]
+            schedule[members] = np.where(rows == Shift.NONE, pattern, rows)
+    
+    def _build_result(self, year: int, month: int, schedule: np.ndarray, cal: SimpleNamespace,
+                      night_counts: Dict[str, int]) -> Dict[str, Any]:
+        """Serialize one month's schedule into the roster response structure"""
+        days = schedule.shape[1]
         
+        # One vectorized int -> label lookup, then a dict per day built from
+        # plain Python lists bound to locals
+        columns = SHIFT_LABELS[schedule].T.tolist()
+        iso_date = cal.iso_date.tolist()
+        day_name = cal.day_name.tolist()
+        weekend = cal.is_weekend.tolist()
+        sunday = cal.is_sunday.tolist()
+        saturday = cal.is_saturday.tolist()
+        codes = self.staff_codes
+        roster = []
         for day in range(days):
-            current_date = date(year, month, day + 1)
-            day_entry = {
-                "date": current_date.isoformat(),
-                "day_name": current_date.strftime("%A"),
+            roster.append({
+                "date": iso_date[day],
+                "day_name": day_name[day],
                 "day_number": day + 1,
-                "is_weekend": current_date.weekday() >= 5,
-                "is_sunday": current_date.weekday() == 6,
-                "is_saturday": current_date.weekday() == 5,
-                "assignments": {}
-            }
-            
-            for code, staff in self.staff.items():
-                # Check leave first
-                if self.is_on_leave(code, current_date):
-                    day_entry["assignments"][code] = "A"
-                    continue
-                
-                # Use night schedule if assigned
-                if schedule[code][day] is not None:
-                    day_entry["assignments"][code] = schedule[code][day]
-                    continue
-                
-                # Get staff preferences
-                pref = self.get_staff_preference(code)
-                pref_type = pref.get("type", "default")
-                
-                # Apply shift preferences
-                if pref_type == "strict_oh":
-                    # Strict OH only, specific weekend day or DO
-                    if day_entry["is_sunday"]:
-                        if pref.get("weekend_day") == "Sunday":
-                            day_entry["assignments"][code] = "OH"
-                        else:
-                            day_entry["assignments"][code] = "DO"
-                    elif day_entry["is_saturday"]:
-                        if pref.get("weekend_day") == "Saturday":
-                            day_entry["assignments"][code] = "OH"
-                        else:
-                            day_entry["assignments"][code] = "DO"
-                    else:
-                        day_entry["assignments"][code] = "OH"
-                
-                elif pref_type == "oh_weekdays_pm_weekends":
-                    # OH on weekdays, PM on weekends (shuffle Sat/Sun)
-                    if day_entry["is_weekend"]:
-                        if pref.get("shuffle"):
-                            # Alternate PM between Sat and Sun
-                            if (day // 7) % 2 == 0:
-                                day_entry["assignments"][code] = "PM" if day_entry["is_saturday"] else "DO"
-                            else:
-                                day_entry["assignments"][code] = "PM" if day_entry["is_sunday"] else "DO"
-                        else:
-                            day_entry["assignments"][code] = "PM"
-                    else:
-                        day_entry["assignments"][code] = "OH"
-                
-                elif pref_type == "oh_weekdays_pm_sunday":
-                    # OH on weekdays, PM only on Sunday
-                    if day_entry["is_sunday"]:
-                        day_entry["assignments"][code] = "PM"
-                    elif day_entry["is_saturday"]:
-                        day_entry["assignments"][code] = "DO"
-                    else:
-                        day_entry["assignments"][code] = "OH"
-                
-                elif pref_type == "emd_predominant":
-                    # Emergency lab predominant
-                    if day_entry["is_sunday"] and pref.get("weekend_day") == "Sunday":
-                        day_entry["assignments"][code] = "OH"  # or their weekend preference
-                    elif day_entry["is_saturday"]:
-                        day_entry["assignments"][code] = "DO"
-                    else:
-                        # Rotate between OH+EMD and OH
-                        if pref.get("night_emd") and code in night_counts:
-                            # They do night EMD, fewer day EMD
-                            day_entry["assignments"][code] = "OH+EMD" if day % 4 == 0 else "OH"
-                        else:
-                            day_entry["assignments"][code] = "OH+EMD" if day % 2 == 0 else "OH"
-                
-                elif pref_type == "pm_predominant":
-                    # PM predominant, few OH
-                    if day_entry["is_weekend"]:
-                        day_entry["assignments"][code] = "DO"
-                    else:
-                        # Mostly PM, some OH
-                        day_entry["assignments"][code] = "PM" if day % 3 != 0 else "OH"
-                
-                elif pref_type == "night_predominant":
-                    # Night predominant - already handled in night schedule
-                    # If not on night shift, give them DO or occasional OH
-                    if day_entry["is_weekend"]:
-                        day_entry["assignments"][code] = "DO"
-                    else:
-                        day_entry["assignments"][code] = "OH" if day % 3 == 0 else "DO"
-                
-                elif pref_type == "bima_predominant":
-                    # BIMA predominant
-                    if day_entry["is_sunday"] and pref.get("weekend_day") == "Sunday":
-                        day_entry["assignments"][code] = "OH"  # Their Sunday working day
-                    elif day_entry["is_saturday"]:
-                        day_entry["assignments"][code] = "DO"
-                    else:
-                        day_entry["assignments"][code] = "OH+BIMA"
-                
-                else:
-                    # Default rules
-                    if day_entry["is_sunday"]:
-                        day_entry["assignments"][code] = "DO"
-                    elif day_entry["is_saturday"]:
-                        day_entry["assignments"][code] = "DO"
-                    else:
-                        day_entry["assignments"][code] = "OH"
-            
-            roster.append(day_entry)
+                "is_weekend": weekend[day],
+                "is_sunday": sunday[day],
+                "is_saturday": saturday[day],
+                "assignments": dict(zip(codes, columns[day]))
+            })
         
         # Calculate statistics
-        shift_counts = {}
-        for day in roster:
-            for shift in day["assignments"].values():
-                shift_counts[shift] = shift_counts.get(shift, 0) + 1
+        vals, counts = np.unique(schedule, return_counts=True)
+        shift_counts = {SHIFT_LABELS[v]: int(c) for v, c in zip(vals, counts)}
         
         return {
             "month": month,
             "year": year,
             "month_name": date(year, month, 1).strftime("%B"),
             "total_days": days,
-            "total_staff": len(self.staff),
+            "total_staff": self.n_staff,
             "shift_distribution": shift_counts,
+            # Every cell is counted in shift_distribution, so its total is the schedule size
+            "total_assignments": int(schedule.size),
             "night_shift_distribution": night_counts,
             "roster": roster,
             "metadata": {
-                "generated_at": date.today().isoformat(),
+                "generated_at": today_iso(),
                 "version": "2.1.0",
                 "pattern": "N→N→SD→DO",
                 "facility": "Mwananyamala Regional Referral Hospital Laboratory",
@@ -483,38 +731,50 @@ class RosterEngine:
             }
         }
     
-    def export_to_excel(self, roster_data: Dict[str, Any]) -> bytes:
-        """Export roster to Excel format"""
-        roster = roster_data["roster"]
-        rows = []
-        staff_codes = list(self.staff.keys())
-        
-        for day in roster:
-            row = {
-                "DATE": day["date"],
-                "DAY": day["day_name"]
-            }
-            row.update(day["assignments"])
-            rows.append(row)
-        
-        df = pd.DataFrame(rows)
-        cols = ["DATE", "DAY"] + staff_codes
-        df = df[cols]
+    def export_to_excel(self, roster_data: Dict[str, Any]) -> io.BytesIO:
+        """Export roster to Excel format, reusing the bytes for rosters this engine cached"""
+        key = (roster_data["year"], roster_data["month"])
+        entry = self._roster_cache.get(key)
+        if entry is None or entry[0] is not roster_data:
+            return self._build_excel(roster_data)
+        excel_bytes = self._excel_cache.get(key)
+        if excel_bytes is None:
+            excel_bytes = self._excel_cache[key] = self._build_excel(roster_data, entry[1], entry[2]).getvalue()
+        # BytesIO shares the cached bytes object until written to, so this is not a copy
+        return io.BytesIO(excel_bytes)
+    
+    def _build_excel(self, roster_data: Dict[str, Any], schedule: Optional[np.ndarray] = None,
+                     cal: Optional[SimpleNamespace] = None) -> io.BytesIO:
+        """Render a roster into an xlsx workbook, columnar from the schedule when available"""
+        if schedule is not None:
+            dates, day_names = cal.iso_date, cal.day_name
+            columns = SHIFT_LABELS[schedule]
+        else:
+            roster = roster_data["roster"]
+            dates = [day["date"] for day in roster]
+            day_names = [day["day_name"] for day in roster]
+            columns = [[day["assignments"].get(code) for day in roster] for code in self.staff_codes]
         
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Duty Roster", index=False)
-            workbook = writer.book
-            worksheet = writer.sheets["Duty Roster"]
-            
-            worksheet.insert_rows(1, 4)
-            worksheet["A1"] = "Laboratory Duty Roster"
-            worksheet["A2"] = f"Effective Date: 01/{roster_data['month']:02d}/{roster_data['year']}"
-            worksheet["A3"] = f"Review Date: {roster_data['total_days']}/{roster_data['month']:02d}/{roster_data['year']}"
-            worksheet["A4"] = f"Version: 4 | Document No.: MRRL/F/190"
+        # in_memory assembles the zip in RAM instead of via temp files on disk
+        workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+        worksheet = workbook.add_worksheet("Duty Roster")
+        # Header block goes in rows 1-4, the roster table starts below it
+        worksheet.write("A1", "Laboratory Duty Roster")
+        worksheet.write("A2", f"Effective Date: 01/{roster_data['month']:02d}/{roster_data['year']}")
+        worksheet.write("A3", f"Review Date: {roster_data['total_days']}/{roster_data['month']:02d}/{roster_data['year']}")
+        worksheet.write("A4", f"Version: 4 | Document No.: MRRL/F/190")
+        # Bold, boxed, centred column headers; unassigned (None) cells are left empty
+        header = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        worksheet.write_row(4, 0, ["DATE", "DAY", *self.staff_codes], header)
+        worksheet.write_column(5, 0, dates)
+        worksheet.write_column(5, 1, day_names)
+        for col, labels in enumerate(columns, start=2):
+            worksheet.write_column(5, col, labels)
+        workbook.close()
         
         output.seek(0)
-        return output.getvalue()
+        return output
 
 # ============================================================================
 # FASTAPI APP
@@ -523,57 +783,191 @@ class RosterEngine:
 app = FastAPI(
     title="MCP Roster Server",
     description="AI Roster Generation System with Realistic Lab Shift Patterns",
-    version="2.1.0"
+    version="2.1.0",
+    default_response_class=ORJSONResponse
 )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class CORSShim:
+    """
+    Allow-all CORS with credentials, as raw ASGI: every header is a constant
+    except the mirrored origin, so nothing is parsed or matched per request
+    """
+    SIMPLE = [(b"access-control-allow-origin", b"*"), (b"access-control-allow-credentials", b"true")]
+    PREFLIGHT = [
+        (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+        (b"access-control-max-age", b"600"),
+        (b"access-control-allow-credentials", b"true"),
+        (b"vary", b"Origin"),
+    ]
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        origin = headers.get(b"origin")
+        if origin is None:
+            return await self.app(scope, receive, send)
+
+        if scope["method"] == "OPTIONS" and b"access-control-request-method" in headers:
+            # Credentialed preflights must name the origin, requested headers are echoed
+            extra = [(b"access-control-allow-origin", origin)]
+            if b"access-control-request-headers" in headers:
+                extra.append((b"access-control-allow-headers", headers[b"access-control-request-headers"]))
+            await send({"type": "http.response.start", "status": 204, "headers": self.PREFLIGHT + extra})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Requests carrying cookies get their origin back instead of "*"
+        cors = self.SIMPLE if b"cookie" not in headers else [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+app.add_middleware(CORSShim)
 
 engine = RosterEngine()
 API_KEY = os.getenv("API_KEY", None)
+_API_KEY_BYTES = API_KEY.encode() if API_KEY else None
+
+# Cache misses are generated in worker processes so they neither block the
+# event loop nor queue behind each other on the GIL; the parent keeps the cache.
+# With a single worker there is no parallelism to gain and the pickling round
+# trip roughly doubles miss latency, so misses are generated in-process instead.
+# The default stays small: os.cpu_count() reports the host's cores rather than a
+# container's CPU quota, and on 3.11 the pool forks every worker on its first job
+ROSTER_WORKERS = int(os.getenv("ROSTER_WORKERS", 0)) or min(2, os.cpu_count() or 1)
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _roster_pool() -> Optional[ProcessPoolExecutor]:
+    """The app's process pool, created on first use so it lives as long as the app, not the import"""
+    global _executor
+    if _executor is None and ROSTER_WORKERS > 1:
+        _executor = ProcessPoolExecutor(max_workers=ROSTER_WORKERS)
+    return _executor
+
+def _generate_in_worker(year: int, month: int) -> Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]:
+    """Executed in a worker process; each worker holds its own module-level engine"""
+    return engine._generate_impl(year, month)
+
+def _generate_year_in_worker(year: int) -> List[Tuple[Dict[str, Any], np.ndarray, SimpleNamespace]]:
+    """Executed in a worker process; like _generate_in_worker, nothing is cached worker-side"""
+    return engine._generate_year_impl(year)
+
+async def _run_pooled(fn, *args):
+    """
+    Run fn in the roster pool, or in-process without one. If a worker died
+    (e.g. OOM-killed) the pool is unusable: drop it so the next miss builds a
+    fresh one, and serve this call in-process
+    """
+    global _executor
+    pool = _roster_pool()
+    if pool is None:
+        return fn(*args)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        if _executor is pool:
+            _executor = None
+        pool.shutdown(wait=False)
+        return fn(*args)
+
+async def generate_async(month: int, year: int) -> Dict[str, Any]:
+    """Return the cached roster, or generate it in the process pool and cache it here"""
+    result = engine.cached(month, year)
+    if result is None:
+        entry = await _run_pooled(_generate_in_worker, year, month)
+        result = engine.adopt(month, year, entry)
+    return result
+
+async def generate_year_async(year: int) -> List[Dict[str, Any]]:
+    """generate_year() counterpart of generate_async()"""
+    rosters = [engine.cached(month, year) for month in range(1, 13)]
+    if any(roster is None for roster in rosters):
+        entries = await _run_pooled(_generate_year_in_worker, year)
+        rosters = [engine.adopt(month, year, entry) for month, entry in enumerate(entries, start=1)]
+    return rosters
 
 def verify_api_key(x_api_key: Optional[str] = Header(None)):
-    if API_KEY and x_api_key != API_KEY:
+    # Constant-time comparison so response timing does not reveal the key prefix
+    if _API_KEY_BYTES and not hmac.compare_digest(_API_KEY_BYTES, (x_api_key or "").encode()):
         raise HTTPException(status_code=401, detail="Invalid API key")
     return True
 
+@app.on_event("startup")
+async def warm_up():
+    # Pay the night phase JIT compile (or cache load) before the first request
+    engine.generate(date.today().month, date.today().year)
+
+@app.on_event("shutdown")
+async def shut_down():
+    # Drop the pool with the app; a later startup in this process gets a fresh one
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+# The status payload only depends on static data, so it is serialized once at import
+_ROOT_PAYLOAD = orjson.dumps({
+    "status": "online",
+    "service": "MCP Roster Server",
+    "version": "2.1.0",
+    "staff_count": len(STAFF_DB),
+    "pattern": "N→N→SD→DO",
+    "shift_preferences": "Realistic lab patterns"
+})
+
 @app.get("/")
 async def root():
-    return {
-        "status": "online",
-        "service": "MCP Roster Server",
-        "version": "2.1.0",
-        "staff_count": len(STAFF_DB),
-        "pattern": "N→N→SD→DO",
-        "shift_preferences": "Realistic lab patterns"
-    }
+    return Response(content=_ROOT_PAYLOAD, media_type="application/json")
+
+# STAFF_DB is static, so the /staff payload is serialized once at import
+_CATEGORIES = {
+    t: [s["code"] for s in STAFF_DB if s.get("shift_preference", {}).get("type") == t]
+    for t in ("strict_oh", "night_predominant", "pm_predominant", "emd_predominant", "bima_predominant")
+}
+_STAFF_PAYLOAD = orjson.dumps({"total": len(STAFF_DB), "staff": STAFF_DB, "categories": _CATEGORIES})
 
 @app.get("/staff")
 async def get_staff():
-    return {
-        "total": len(STAFF_DB),
-        "staff": STAFF_DB,
-        "categories": {
-            "strict_oh": [s["code"] for s in STAFF_DB if s.get("shift_preference", {}).get("type") == "strict_oh"],
-            "night_predominant": [s["code"] for s in STAFF_DB if s.get("shift_preference", {}).get("type") == "night_predominant"],
-            "pm_predominant": [s["code"] for s in STAFF_DB if s.get("shift_preference", {}).get("type") == "pm_predominant"],
-            "emd_predominant": [s["code"] for s in STAFF_DB if s.get("shift_preference", {}).get("type") == "emd_predominant"],
-            "bima_predominant": [s["code"] for s in STAFF_DB if s.get("shift_preference", {}).get("type") == "bima_predominant"]
-        }
-    }
+    return Response(content=_STAFF_PAYLOAD, media_type="application/json")
+
+# Leave entries indexed by every calendar year they touch, plus the unfiltered payload
+_LEAVE_BY_YEAR: Dict[int, List[Dict[str, str]]] = {}
+for _leave in LEAVE_2026:
+    for _year in range(int(_leave["start"][:4]), int(_leave["end"][:4]) + 1):
+        _LEAVE_BY_YEAR.setdefault(_year, []).append(_leave)
+_LEAVE_PAYLOAD = orjson.dumps({"total": len(LEAVE_2026), "leaves": LEAVE_2026})
 
 @app.get("/leave")
 async def get_leave_schedule(year: Optional[int] = None):
-    leaves = LEAVE_2026
-    if year:
-        leaves = [l for l in leaves if year in l["start"] or year in l["end"]]
+    if not year:
+        return Response(content=_LEAVE_PAYLOAD, media_type="application/json")
+    leaves = _LEAVE_BY_YEAR.get(year, [])
     return {"total": len(leaves), "leaves": leaves}
 
+def mcp_response(success: bool, data: Optional[Dict[str, Any]] = None,
+                 error: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None,
+                 status_code: int = 200) -> ORJSONResponse:
+    """
+    MCPResponse-shaped body handed straight to orjson; returning a Response skips
+    FastAPI's response_model re-validation and jsonable_encoder walk of the roster
+    """
+    return ORJSONResponse(
+        {"success": success, "data": data, "error": error, "metadata": metadata or {}},
+        status_code=status_code
+    )
+
 @app.post("/generate-roster", response_model=MCPResponse)
 async def generate_roster(
     request: RosterRequest,
@@ -581,7 +975,16 @@ async def generate_roster(
     authorized: bool = Depends(verify_api_key)
 ):
     try:
-        result = engine.generate(request.month, request.year)
+        result = await generate_async(request.month, request.year)
+        excel_filename = f"roster_{request.year}_{request.month:02d}.xlsx"
+        
+        if request.include_excel and not request.excel_inline:
+            # File-only clients get the workbook streamed, no base64 round-trip
+            return StreamingResponse(
+                engine.export_to_excel(result),
+                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                headers={"Content-Disposition": f"attachment; filename={excel_filename}"}
+            )
         
         response_data = {
             "roster": result,
@@ -589,28 +992,53 @@ async def generate_roster(
         }
         
         if request.include_excel:
-            excel_bytes = engine.export_to_excel(result)
-            excel_b64 = base64.b64encode(excel_bytes).decode("utf-8")
-            response_data["excel_base64"] = excel_b64
-            response_data["excel_filename"] = f"roster_{request.year}_{request.month:02d}.xlsx"
+            excel_bytes = engine.export_to_excel(result).getvalue()
+            # base64 output is pure ASCII, which decodes without UTF-8 validation
+            response_data["excel_base64"] = base64.b64encode(excel_bytes).decode("ascii")
+            response_data["excel_filename"] = excel_filename
         
-        return MCPResponse(
-            success=True,
+        return mcp_response(
+            True,
             data=response_data,
             metadata={
-                "generated_at": date.today().isoformat(),
+                "generated_at": today_iso(),
                 "pattern_compliance": "N→N→SD→DO",
                 "shift_preferences": "Realistic lab patterns",
-                "total_assignments": sum(result["shift_distribution"].values())
+                "total_assignments": result["total_assignments"]
             }
         )
         
+    except RosterEngineError as e:
+        return mcp_response(
+            False, error=e.code, metadata={"month": request.month, "year": request.year}, status_code=400
+        )
     except Exception as e:
-        return MCPResponse(
-            success=False,
-            error=str(e),
-            metadata={"request": request.dict()}
+        return mcp_response(False, error=str(e), metadata={"request": request.dict()})
+
+@app.post("/generate-year-roster", response_model=MCPResponse)
+async def generate_year_roster(
+    request: YearRosterRequest,
+    authorized: bool = Depends(verify_api_key)
+):
+    try:
+        rosters = await generate_year_async(request.year)
+        
+        return mcp_response(
+            True,
+            data={"year": request.year, "rosters": rosters},
+            metadata={
+                "generated_at": today_iso(),
+                "pattern_compliance": "N→N→SD→DO",
+                "shift_preferences": "Realistic lab patterns",
+                "months": len(rosters),
+                "total_assignments": sum(r["total_assignments"] for r in rosters)
+            }
         )
+        
+    except RosterEngineError as e:
+        return mcp_response(False, error=e.code, metadata={"year": request.year}, status_code=400)
+    except Exception as e:
+        return mcp_response(False, error=str(e), metadata={"request": request.dict()})
 
 @app.post("/validate-roster")
 async def validate_roster(request: ShiftValidateRequest):
@@ -618,22 +1046,23 @@ async def validate_roster(request: ShiftValidateRequest):
     roster = request.roster_data.get("roster", [])
     
     if "night_pattern" in request.rules:
-        for day_idx, day in enumerate(roster):
-            for code, shift in day.get("assignments", {}).items():
+        # Only N cells need a lookahead, so scan the assignment dicts directly;
+        # each following day's dict is fetched once up front, not per N cell
+        days = [day.get("assignments", {}) for day in roster]
+        for day_idx in range(len(days) - 3):
+            for code, shift in days[day_idx].items():
                 if shift == "N":
-                    if day_idx + 3 < len(roster):
-                        next1 = roster[day_idx + 1]["assignments"].get(code)
-                        next2 = roster[day_idx + 2]["assignments"].get(code)
-                        next3 = roster[day_idx + 3]["assignments"].get(code)
-                        if [next1, next2, next3] != ["N", "SD", "DO"]:
-                            if next1 != "A":
-                                violations.append({
-                                    "type": "night_pattern",
-                                    "staff": code,
-                                    "date": day["date"],
-                                    "expected": "N,SD,DO",
-                                    "actual": f"{next1},{next2},{next3}"
-                                })
+                    next1 = days[day_idx + 1].get(code)
+                    next2 = days[day_idx + 2].get(code)
+                    next3 = days[day_idx + 3].get(code)
+                    if next1 != "A" and (next1, next2, next3) != ("N", "SD", "DO"):
+                        violations.append({
+                            "type": "night_pattern",
+                            "staff": code,
+                            "date": roster[day_idx]["date"],
+                            "expected": "N,SD,DO",
+                            "actual": f"{next1},{next2},{next3}"
+                        })
     
     return {
         "valid": len(violations) == 0,
@@ -644,44 +1073,63 @@ async def validate_roster(request: ShiftValidateRequest):
 @app.get("/download-roster/{year}/{month}")
 async def download_roster(year: int, month: int):
     try:
-        result = engine.generate(month, year)
-        excel_bytes = engine.export_to_excel(result)
-        
+        result = await generate_async(month, year)
         return StreamingResponse(
-            io.BytesIO(excel_bytes),
+            engine.export_to_excel(result),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": f"attachment; filename=roster_{year}_{month:02d}.xlsx"
             }
         )
+    except RosterEngineError as e:
+        raise HTTPException(status_code=400, detail=e.code)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/mcp-schema")
-async def mcp_schema():
-    return {
-        "tools": [
-            {
-                "name": "generate_lab_roster",
-                "description": "Generates ISO-compliant laboratory roster with realistic shift preferences (strict OH, PM predominant, night predominant, EMD/BIMA allocation)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "month": {"type": "integer", "minimum": 1, "maximum": 12},
-                        "year": {"type": "integer", "minimum": 2024, "maximum": 2030},
-                        "include_excel": {"type": "boolean", "default": True}
-                    },
-                    "required": ["month", "year"]
-                }
+@app.post("/cache/clear")
+async def clear_cache(authorized: bool = Depends(verify_api_key)):
+    return {"cleared": True, "cached_months": engine.clear_cache()}
+
+# Static MCP tool description, serialized once at import
+_MCP_SCHEMA_PAYLOAD = orjson.dumps({
+    "tools": [
+        {
+            "name": "generate_lab_roster",
+            "description": "Generates ISO-compliant laboratory roster with realistic shift preferences (strict OH, PM predominant, night predominant, EMD/BIMA allocation)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "month": {"type": "integer", "minimum": 1, "maximum": 12},
+                    "year": {"type": "integer", "minimum": 2024, "maximum": 2030},
+                    "include_excel": {"type": "boolean", "default": True},
+                    "excel_inline": {"type": "boolean", "default": True}
+                },
+                "required": ["month", "year"]
             }
-        ],
-        "endpoints": {
-            "generate_roster": "/generate-roster",
-            "validate_roster": "/validate-roster",
-            "download_excel": "/download-roster/{year}/{month}"
         }
+    ],
+    "endpoints": {
+        "generate_roster": "/generate-roster",
+        "generate_year_roster": "/generate-year-roster",
+        "validate_roster": "/validate-roster",
+        "download_excel": "/download-roster/{year}/{month}"
     }
+})
+
+@app.get("/mcp-schema")
+async def mcp_schema():
+    return Response(content=_MCP_SCHEMA_PAYLOAD, media_type="application/json")
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 10000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.getenv("WORKERS", 1))
+    # Multiple workers need an import string so each process loads its own app
+    uvicorn.run(
+        "main:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+        access_log=False
+    )
\ No newline at end of file